@@ -0,0 +1,113 @@
+"""
+Shared CSV loading for the analysis scripts.
+
+The scripts are usually run back-to-back on the same file (EDA, groups,
+prediction, forecast), so the parsed CSV is cached as a sibling Parquet file
+and reused until the CSV changes. Later runs read only the columns they need.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+def _cache_path(path):
+    return f"{path}.cache.parquet"
+
+
+def _source_key(stat):
+    """Schema metadata identifying the CSV a cache was built from."""
+    return {b'source_mtime_ns': str(stat.st_mtime_ns).encode(), b'source_size': str(stat.st_size).encode()}
+
+
+def _is_fresh(path, cache_path):
+    """
+    The cache is valid only if it was built from a CSV with exactly this mtime and size.
+    A plain newer-than check would keep serving it after `cp -p`, `rsync -a` or an
+    archive extraction puts back a file with an older mtime.
+    """
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+        key = _source_key(os.stat(path))
+    except (OSError, pa.ArrowException):
+        return False
+    return all(metadata.get(k) == v for k, v in key.items())
+
+
+def _normalize(df):
+    """
+    Make the CSV and Parquet paths return identical frames: pyarrow parses timestamps
+    as [s], which Parquet cannot store and widens to [ms], so use [ms] on both.
+    """
+    for col in df.select_dtypes(include=['datetime', 'datetimetz']).columns:
+        if df[col].dt.unit == 's':
+            df[col] = df[col].dt.as_unit('ms')
+    return df
+
+
+def load_dataset(path, columns=None):
+    """
+    Load a CSV (optionally only `columns`), going through a Parquet cache next to it.
+    Falls back to a plain pd.read_csv when pyarrow is not installed.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+
+    if pa is None:
+        return pd.read_csv(path, usecols=columns)
+
+    cache_path = _cache_path(path)
+    if _is_fresh(path, cache_path):
+        return _normalize(pd.read_parquet(cache_path, columns=columns))
+
+    # Stat before reading, so a CSV rewritten mid-read fails the check next time
+    key = _source_key(os.stat(path))
+    df = _normalize(pd.read_csv(path, engine='pyarrow'))
+
+    # Write to a temp file and rename so a concurrent run never sees a partial cache;
+    # an unwritable directory just means no cache
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **key})
+        pq.write_table(table, tmp_path, compression='snappy')
+        os.replace(tmp_path, cache_path)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print(f"Warning: could not write Parquet cache ({e})")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return df if columns is None else df[columns]
+
+
+class RowSampler:
+    """Uniform random sample of at most size rows from a stream of DataFrame chunks."""
+
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.sample = None
+
+    def add(self, chunk):
+        # Reservoir via random keys: keep the size rows with the smallest keys seen so far
+        chunk = chunk.assign(_key=self.rng.random(len(chunk)))
+        self.sample = chunk if self.sample is None else pd.concat([self.sample, chunk])
+        if len(self.sample) > self.size:
+            self.sample = self.sample.nsmallest(self.size, '_key')
+
+    def result(self):
+        """The sampled rows, back in file order."""
+        return self.sample.sort_index().drop(columns='_key').reset_index(drop=True)
+
+
+def read_csv_sample(path, chunksize, sample_size, seed=42):
+    """Stream a CSV in chunks, keeping a uniform random sample of at most sample_size rows."""
+    sampler = RowSampler(sample_size, seed)
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        sampler.add(chunk)
+    return sampler.result()
@@ -0,0 +1,32 @@
+"""
+Dtype downcasting shared by the analysis scripts.
+
+Narrower columns mean fewer bytes through every groupby, corr and model fit.
+"""
+import numpy as np
+import pandas as pd
+
+
+def optimize_dtypes(df, category_ratio=0.5):
+    """
+    Downcast a freshly loaded DataFrame without changing any value:
+    - integer columns go to the smallest integer type that holds them
+    - float columns go to float32 only when every value round-trips exactly
+    - text columns become category when fewer than category_ratio of the values are unique
+    """
+    for col in df.select_dtypes(include=[np.integer]).columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    for col in df.select_dtypes(include=[np.float64]).columns:
+        values = df[col].to_numpy()
+        with np.errstate(over='ignore'):
+            narrow = values.astype(np.float32)
+        if np.array_equal(narrow, values, equal_nan=True):
+            df[col] = narrow
+
+    n = max(len(df), 1)
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        if df[col].nunique() / n < category_ratio:
+            df[col] = df[col].astype('category')
+
+    return df
@@ -0,0 +1,54 @@
+"""
+Hour-of-day / day-of-week aggregations for hourly time series.
+
+Both profiles come out of one scan over the values: a parallel numba kernel
+when numba is installed, otherwise two NumPy bincounts.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange, get_num_threads
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    # No fastmath: it assumes no NaNs, and missing values must be skipped like pandas does
+    @njit(parallel=True, cache=True)
+    def _hour_dow_sums(hours, dows, values, n_threads):
+        """Per-thread partial sums/counts over contiguous row blocks, merged at the end."""
+        n = values.size
+        step = (n + n_threads - 1) // n_threads
+        sums_h = np.zeros((n_threads, 24))
+        cnts_h = np.zeros((n_threads, 24), dtype=np.int64)
+        sums_d = np.zeros((n_threads, 7))
+        cnts_d = np.zeros((n_threads, 7), dtype=np.int64)
+        for t in prange(n_threads):
+            for i in range(t * step, min(n, (t + 1) * step)):
+                v = values[i]
+                if not np.isnan(v):
+                    sums_h[t, hours[i]] += v
+                    cnts_h[t, hours[i]] += 1
+                    sums_d[t, dows[i]] += v
+                    cnts_d[t, dows[i]] += 1
+        return sums_h.sum(axis=0), cnts_h.sum(axis=0), sums_d.sum(axis=0), cnts_d.sum(axis=0)
+
+
+def hour_dow_sums(hours, dows, values):
+    """
+    Sums and non-missing counts of values by hour (0-23) and weekday (0=Monday).
+    Returns (sums_h, cnts_h, sums_d, cnts_d).
+    """
+    hours = np.asarray(hours, dtype=np.int64)
+    dows = np.asarray(dows, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    if njit is not None:
+        return _hour_dow_sums(hours, dows, values, get_num_threads())
+
+    valid = ~np.isnan(values)
+    v = values[valid]
+    return (np.bincount(hours[valid], weights=v, minlength=24),
+            np.bincount(hours[valid], minlength=24),
+            np.bincount(dows[valid], weights=v, minlength=7),
+            np.bincount(dows[valid], minlength=7))
@@ -25,28 +25,65 @@ Usage:
         --group channel \
         --covariates age,gender,channel \
         --output did_report
+
+    # 超大文件：分块流式读取，回归使用抽样，分组均值使用全量
+    python3 scripts/analyze_did.py big.csv \
+        --treatment treated \
+        --outcome retention \
+        --time date \
+        --group channel \
+        --chunksize 1000000 \
+        --output did_report
 """
 import argparse
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import sys
 import warnings
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from _dataset_io import load_dataset, read_csv_sample
 
 # Set style
 plt.style.use('ggplot')
-sns.set_palette("husl")
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'STHeiti', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False
 warnings.filterwarnings('ignore')
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
 
-def load_and_prepare_data(file_path, treatment_col, outcome_col, time_col, group_col, covariates=None):
-    """Load data and prepare for DID analysis."""
-    df = pd.read_csv(file_path)
+
+def _parse_time(series):
+    """Convert a time column to datetime64[ns] when possible, else return it unchanged."""
+    # Pin ns resolution for every input: the pyarrow engine and the Parquet cache hand
+    # back [s] or [ms] columns, and a coarser unit would rescale the trend slopes
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.as_unit('ns')
+    try:
+        return pd.to_datetime(series).dt.as_unit('ns')
+    except:
+        return series
+
+
+def load_and_prepare_data(file_path, treatment_col, outcome_col, time_col, group_col, covariates=None,
+                          chunksize=None, sample_size=200_000):
+    """Load data and prepare for DID analysis.
+
+    With chunksize set, the file is streamed and only a random sample of
+    sample_size rows is kept in memory.
+    """
+    if chunksize:
+        df = read_csv_sample(file_path, chunksize, sample_size)
+    else:
+        df = load_dataset(file_path)
 
     required_cols = [treatment_col, outcome_col, time_col, group_col]
     missing = [c for c in required_cols if c not in df.columns]
@@ -56,11 +93,7 @@ def load_and_prepare_data(file_path, treatment_col, outcome_col, time_col, group
         return None
 
     # Convert time_col to datetime if needed
-    if not pd.api.types.is_datetime64_any_dtype(df[time_col]):
-        try:
-            df[time_col] = pd.to_datetime(df[time_col])
-        except:
-            pass
+    df[time_col] = _parse_time(df[time_col])
 
     # Convert treatment to binary if needed
     unique_treat = df[treatment_col].unique()
@@ -71,46 +104,156 @@ def load_and_prepare_data(file_path, treatment_col, outcome_col, time_col, group
     return df
 
 
-def run_did_regression(df, treatment_col, outcome_col, time_col, group_col, covariates=None):
+def _binarize(series, value):
+    """Return an int8 indicator of series == value, written straight into a bool buffer."""
+    out = np.empty(len(series), dtype=bool)
+    np.equal(series.to_numpy(), value, out=out)
+    return out.view(np.int8)
+
+
+def stream_post_threshold(file_path, time_col, chunksize):
+    """Find the full-file median time (the post threshold) by streaming per-time row counts."""
+    counts = None
+    for chunk in pd.read_csv(file_path, usecols=[time_col], chunksize=chunksize):
+        vc = _parse_time(chunk[time_col]).value_counts()
+        counts = vc if counts is None else counts.add(vc, fill_value=0)
+
+    counts = counts.sort_index()
+    median_pos = int(counts.sum()) // 2
+    return counts.index[np.searchsorted(counts.cumsum().values, median_pos, side='right')]
+
+
+def stream_group_means(file_path, treatment_col, outcome_col, time_col, treated_val, post_threshold,
+                       chunksize):
+    """Compute exact DID group-time means in one streaming pass with running sums per cell."""
+    sums = np.zeros(4)
+    counts = np.zeros(4)
+    n_rows = 0
+    treat_values = pd.Series(dtype=object)
+
+    for chunk in pd.read_csv(file_path, usecols=[treatment_col, outcome_col, time_col], chunksize=chunksize):
+        # The sample only saw part of the file; a third arm would otherwise be counted as control
+        treat_values = pd.concat([treat_values, chunk[treatment_col].drop_duplicates()]).drop_duplicates()
+        if len(treat_values) > 2:
+            print(f"Error: Treatment column has >2 unique values: {treat_values.values}")
+            return None
+
+        treated = _binarize(chunk[treatment_col], treated_val)
+        post = (_parse_time(chunk[time_col]) >= post_threshold).values.astype(np.int64)
+        y = chunk[outcome_col].values.astype(np.float64)
+        ok = np.isfinite(y)
+
+        # Cell index: 0=control/pre, 1=control/post, 2=treated/pre, 3=treated/post
+        cell = (2 * treated.astype(np.int64) + post)[ok]
+        sums += np.bincount(cell, weights=y[ok], minlength=4)
+        counts += np.bincount(cell, minlength=4)
+        n_rows += len(chunk)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    return {
+        'control_pre': means[0],
+        'control_post': means[1],
+        'treated_pre': means[2],
+        'treated_post': means[3],
+        'n_observations': n_rows
+    }
+
+
+Panel = namedtuple('Panel', ['unique_times', 'time_idx', 'treated_val', 'treated', 'post', 'post_threshold',
+                             'group', 'y'])
+
+
+def _prep_panel(df, treatment_col, outcome_col, time_col, group_col, post_threshold=None, treated_val=None):
+    """Derive the arrays shared by the DID, event study and parallel-trends steps in one pass."""
+    time_values = df[time_col].values
+
+    # One sort yields both the ordered time points and each row's index into them.
+    # Rows with a missing time (NaT) get index -1 and belong to no period
+    has_time = ~pd.isna(time_values)
+    unique_times, inverse = np.unique(time_values[has_time], return_inverse=True)
+    time_idx = np.full(len(time_values), -1, dtype=np.int64)
+    time_idx[has_time] = inverse
+
+    # Treated indicator (binary): the value in the first row is the treated arm
+    if treated_val is None:
+        treated_val = df[treatment_col].unique()[0]
+    treated = _binarize(df[treatment_col], treated_val)
+
+    # Post indicator (assuming later time is "post"). The median row time falls out of
+    # the sorted unique times and their row counts, so no second pass over the column
+    time_index = pd.Index(unique_times)
+    if post_threshold is None:
+        # Median over all rows with missing times sorted last, like sort_values().iloc[n // 2]
+        counts = np.bincount(inverse, minlength=len(unique_times))
+        median_idx = np.searchsorted(np.cumsum(counts), len(time_values) // 2, side='right')
+        median_idx = min(median_idx, len(unique_times) - 1)
+        post_threshold = time_index[median_idx]
+    else:
+        median_idx = time_index.searchsorted(post_threshold, side='left')
+    # Missing times compare False against the threshold, so they stay pre (post=0)
+    post = (time_idx >= median_idx).view(np.int8)
+
+    return Panel(unique_times=unique_times,
+                 time_idx=time_idx.astype(np.int32),
+                 treated_val=treated_val,
+                 treated=treated,
+                 post=post,
+                 post_threshold=post_threshold,
+                 group=df[group_col].values,
+                 y=df[outcome_col].values.astype(np.float64))
+
+
+def run_did_regression(df, treatment_col, outcome_col, time_col, group_col, covariates=None, panel=None):
     """Run DID regression and return results."""
     try:
-        import statsmodels.formula.api as smf
+        import statsmodels.api as sm
     except ImportError:
         print("Error: statsmodels not installed. Run: pip install statsmodels")
         return None
 
-    # Create post indicator (assuming later time is "post")
-    time_col_sorted = df[time_col].sort_values()
-    median_time = time_col_sorted.iloc[len(time_col_sorted) // 2]
-    df['post'] = (df[time_col] >= median_time).astype(int)
-
-    # Create treated indicator (binary)
-    treated_val = df[treatment_col].unique()[0]
-    df['treated'] = (df[treatment_col] == treated_val).astype(int)
+    if panel is None:
+        panel = _prep_panel(df, treatment_col, outcome_col, time_col, group_col)
 
-    # Build formula
-    formula = f"{outcome_col} ~ treated + post + treated:post"
+    # Design matrix: Y = b0 + b1*treated + b2*post + b3*(treated x post) [+ covariates]
+    median_time = panel.post_threshold
+    treated = panel.treated.astype(np.float64)
+    post = panel.post.astype(np.float64)
+    columns = [np.ones(len(treated)), treated, post, treated * post]
+    names = ['Intercept', 'treated', 'post', 'treated:post']
 
     if covariates and len(covariates) > 0:
-        # Add covariates
+        # Add covariates; categorical ones are dummy-coded as the formula API did
         valid_covariates = [c for c in covariates if c in df.columns]
         if valid_covariates:
-            formula = f"{outcome_col} ~ treated + post + treated:post + " + " + ".join(valid_covariates)
+            cov = pd.get_dummies(df[valid_covariates], drop_first=True, dtype=np.float64)
+            columns.append(cov.to_numpy(dtype=np.float64))
+            names.extend(cov.columns)
+
+    X = np.column_stack(columns)
+    y = panel.y
+
+    # Drop rows with missing values, as the formula API did
+    valid = np.isfinite(y) & np.isfinite(X).all(axis=1)
 
     try:
-        model = smf.ols(formula, data=df).fit(cov_type='cluster', cov_kwds={'groups': df[group_col]})
+        model = sm.OLS(y[valid], X[valid]).fit(
+            cov_type='cluster', cov_kwds={'groups': panel.group[valid]})
 
         # Extract key results
-        did_estimate = model.params.get('treated:post', 0)
-        did_se = model.bse.get('treated:post', 0)
-        did_pvalue = model.pvalues.get('treated:post', 1)
-        did_ci = model.conf_int().loc['treated:post'] if 'treated:post' in model.conf_int().index else [0, 0]
+        did_idx = names.index('treated:post')
+        did_estimate = model.params[did_idx]
+        did_se = model.bse[did_idx]
+        did_pvalue = model.pvalues[did_idx]
+        did_ci = model.conf_int()[did_idx]
 
         # Calculate group-time means for description
-        treated_post = df[(df['treated'] == 1) & (df['post'] == 1)][outcome_col].mean()
-        treated_pre = df[(df['treated'] == 1) & (df['post'] == 0)][outcome_col].mean()
-        control_post = df[(df['treated'] == 0) & (df['post'] == 1)][outcome_col].mean()
-        control_pre = df[(df['treated'] == 0) & (df['post'] == 0)][outcome_col].mean()
+        means = pd.Series(y).groupby([panel.treated, panel.post]).mean()
+        treated_post = means.get((1, 1), np.nan)
+        treated_pre = means.get((1, 0), np.nan)
+        control_post = means.get((0, 1), np.nan)
+        control_pre = means.get((0, 0), np.nan)
 
         return {
             'model': model,
@@ -130,20 +273,63 @@ def run_did_regression(df, treatment_col, outcome_col, time_col, group_col, cova
         return None
 
 
-def run_event_study(df, treatment_col, outcome_col, time_col, group_col):
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _cluster_scores(X, resid, order, starts):
+        """Per-cluster score sums X_c'e_c; rows are pre-sorted by cluster so threads never collide."""
+        n_groups = len(starts) - 1
+        scores = np.zeros((n_groups, X.shape[1]))
+        for g in prange(n_groups):
+            for r in range(starts[g], starts[g + 1]):
+                i = order[r]
+                for j in range(X.shape[1]):
+                    scores[g, j] += X[i, j] * resid[i]
+        return scores
+
+
+def _event_study_numba(y, X, groups):
+    """OLS with cluster-robust errors using a numba kernel for the sandwich meat.
+
+    Matches statsmodels' cov_type='cluster' (small-sample correction, normal
+    inference) and returns params, bse, pvalues and a (k, 2) 95% CI array.
+    """
+    from scipy import stats
+
+    n, k = X.shape
+    # Pseudo-inverse, as statsmodels uses: a rank-deficient design (e.g. a period
+    # with no treated rows) gets the minimum-norm solution instead of raising
+    bread = np.linalg.pinv(X.T @ X)
+    params = bread @ (X.T @ y)
+    resid = y - X @ params
+
+    # Sort rows by cluster once so each cluster is a contiguous slice
+    _, codes = np.unique(groups, return_inverse=True)
+    order = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[order], np.arange(codes.max() + 2))
+    n_groups = len(starts) - 1
+
+    scores = _cluster_scores(X, resid, order, starts)
+    correction = n_groups / (n_groups - 1.0) * (n - 1.0) / (n - k)
+    cov = correction * bread @ (scores.T @ scores) @ bread
+
+    bse = np.sqrt(np.diag(cov))
+    pvalues = 2 * stats.norm.sf(np.abs(params / bse))
+    z = stats.norm.ppf(0.975)
+    ci = np.column_stack([params - z * bse, params + z * bse])
+    return params, bse, pvalues, ci
+
+
+def run_event_study(df, treatment_col, outcome_col, time_col, group_col, panel=None):
     """Run Event Study regression to get dynamic effects."""
     try:
-        import statsmodels.formula.api as smf
+        import statsmodels.api as sm
     except ImportError:
         return None
 
-    # Sort by time and create relative time indicators
-    df = df.copy()
-    df = df.sort_values(time_col)
-
-    # Get unique time points
-    unique_times = df[time_col].unique()
-    unique_times = sorted(unique_times)
+    # Work on the needed columns as arrays; no frame copy or column inserts
+    if panel is None:
+        panel = _prep_panel(df, treatment_col, outcome_col, time_col, group_col)
+    unique_times = panel.unique_times
 
     if len(unique_times) < 3:
         print("Warning: Not enough time periods for event study")
@@ -153,46 +339,49 @@ def run_event_study(df, treatment_col, outcome_col, time_col, group_col):
     ref_idx = len(unique_times) // 2
     ref_time = unique_times[ref_idx]
 
-    # Create treated indicator
-    treated_val = df[treatment_col].unique()[0]
-    df['treated'] = (df[treatment_col] == treated_val).astype(int)
-
-    # Create relative time dummies (before/after reference period)
-    df['time_idx'] = df[time_col].map({t: i for i, t in enumerate(unique_times)})
-    df['relative_time'] = df['time_idx'] - ref_idx
-
-    # Run event study regression
-    # Create dummies for each relative time period
+    treated = panel.treated.astype(np.float64)
+
+    # Build the design matrix in one preallocated block: one-hot relative-time
+    # dummies (reference period dropped) plus their interaction with treated,
+    # scattered in by fancy indexing instead of stacking intermediate copies
+    K = len(unique_times)
+    keep = np.arange(K) != ref_idx
+    relative_times = np.arange(K)[keep] - ref_idx
+
+    X = np.zeros((len(treated), 2 * K), dtype=np.float64)
+    X[:, 0] = 1.0
+    X[:, 1] = treated
+    rows = np.flatnonzero((panel.time_idx != ref_idx) & (panel.time_idx >= 0))
+    cols = 2 + panel.time_idx[rows] - (panel.time_idx[rows] > ref_idx)
+    X[rows, cols] = 1.0
+    X[rows, cols + K - 1] = treated[rows]
+    y = panel.y
+
+    # Drop rows with missing outcome, as the formula API did, and rows outside every period
+    valid = np.isfinite(y) & (panel.time_idx >= 0)
     event_study_results = []
 
-    for rt in sorted(df['relative_time'].unique()):
-        if rt == 0:  # Reference period
-            continue
-
-        df[f'event_{rt}'] = (df['relative_time'] == rt).astype(int)
-        df[f'event_{rt}_treated'] = df[f'event_{rt}'] * df['treated']
-
-    # Build formula
-    event_terms = [f'event_{rt}_treated' for rt in sorted(df['relative_time'].unique()) if rt != 0]
-    formula = f"{outcome_col} ~ treated + " + " + ".join([f"event_{rt}" for rt in sorted(df['relative_time'].unique()) if rt != 0]) + " + " + " + ".join(event_terms)
-
     try:
-        model = smf.ols(formula, data=df).fit(cov_type='cluster', cov_kwds={'groups': df[group_col]})
-
-        # Extract coefficients and confidence intervals
-        for rt in sorted(df['relative_time'].unique()):
-            if rt == 0:
-                continue
-            term = f'event_{rt}_treated'
-            if term in model.params:
-                event_study_results.append({
-                    'relative_time': rt,
-                    'coefficient': model.params[term],
-                    'se': model.bse[term],
-                    'ci_lower': model.conf_int().loc[term, 0],
-                    'ci_upper': model.conf_int().loc[term, 1],
-                    'pvalue': model.pvalues[term]
-                })
+        if njit is not None and K > 20:
+            # Long panels: compiled cluster-sandwich kernel instead of statsmodels
+            params, bse, pvalues, ci = _event_study_numba(y[valid], X[valid], panel.group[valid])
+        else:
+            model = sm.OLS(y[valid], X[valid]).fit(
+                cov_type='cluster', cov_kwds={'groups': panel.group[valid]})
+            params, bse, pvalues, ci = model.params, model.bse, model.pvalues, model.conf_int()
+
+        # Interaction coefficients sit after const, treated and the K-1 dummies
+        offset = 2 + len(relative_times)
+        for i, rt in enumerate(relative_times):
+            j = offset + i
+            event_study_results.append({
+                'relative_time': rt,
+                'coefficient': params[j],
+                'se': bse[j],
+                'ci_lower': ci[j, 0],
+                'ci_upper': ci[j, 1],
+                'pvalue': pvalues[j]
+            })
 
         return pd.DataFrame(event_study_results)
     except Exception as e:
@@ -200,12 +389,13 @@ def run_event_study(df, treatment_col, outcome_col, time_col, group_col):
         return None
 
 
-def test_parallel_trends(df, treatment_col, outcome_col, time_col, group_col):
+def test_parallel_trends(df, treatment_col, outcome_col, time_col, group_col, panel=None):
     """Test parallel trends assumption using pre-treatment data."""
-    df = df.copy()
+    if panel is None:
+        panel = _prep_panel(df, treatment_col, outcome_col, time_col, group_col)
 
     # Get unique time points and identify pre-treatment period
-    unique_times = sorted(df[time_col].unique())
+    unique_times = panel.unique_times
     if len(unique_times) < 2:
         return None
 
@@ -214,30 +404,38 @@ def test_parallel_trends(df, treatment_col, outcome_col, time_col, group_col):
     pre_times = unique_times[:mid_idx]
     post_times = unique_times[mid_idx:]
 
-    # Calculate means for each group in pre-period
-    treated_val = df[treatment_col].unique()[0]
-    df['treated'] = (df[treatment_col] == treated_val).astype(int)
-    df['post'] = df[time_col].isin(post_times).astype(int)
-
     # Pre-period parallel trends test: compare trends in pre-period
-    pre_df = df[df['post'] == 0]
+    pre = (panel.time_idx >= 0) & (panel.time_idx < mid_idx)
+    g = panel.treated[pre]
 
-    if len(pre_df) == 0 or pre_df['treated'].nunique() < 2:
+    if len(g) == 0 or len(np.unique(g)) < 2:
         return None
 
-    # Calculate trend for each group in pre-period
-    pre_trends = pre_df.groupby('treated').apply(
-        lambda x: np.polyfit(x[time_col].astype('int64'), x[outcome_col], 1)[0] if len(x) > 1 else 0
-    )
+    # Calculate trend for each group in pre-period: closed-form OLS slope
+    # (n*Sxy - Sx*Sy) / (n*Sxx - Sx^2) from per-group sums
+    t = unique_times.astype('int64').astype(np.float64)[panel.time_idx[pre]]
+    t -= t.mean()  # slope is shift-invariant; centering keeps the sums well-conditioned
+    y = panel.y[pre]
+
+    n = np.bincount(g, minlength=2)
+    sx = np.bincount(g, weights=t, minlength=2)
+    sy = np.bincount(g, weights=y, minlength=2)
+    sxy = np.bincount(g, weights=t * y, minlength=2)
+    sxx = np.bincount(g, weights=t * t, minlength=2)
+
+    denom = n * sxx - sx * sx
+    safe = (n > 1) & (denom != 0)
+    slopes = np.where(safe, (n * sxy - sx * sy) / np.where(safe, denom, 1), 0.0)
+    pre_trends = dict(enumerate(slopes))
 
     trend_diff = abs(pre_trends.get(1, 0) - pre_trends.get(0, 0))
 
     # Also calculate simple mean difference in pre-period
-    pre_means = pre_df.groupby('treated')[outcome_col].mean()
-    mean_diff = abs(pre_means.get(1, 0) - pre_means.get(0, 0))
+    pre_means = sy / n
+    mean_diff = abs(pre_means[1] - pre_means[0])
 
     return {
-        'pre_trends': pre_trends.to_dict(),
+        'pre_trends': pre_trends,
         'trend_difference': trend_diff,
         'pre_mean_difference': mean_diff,
         'pre_times': pre_times,
@@ -246,7 +444,7 @@ def test_parallel_trends(df, treatment_col, outcome_col, time_col, group_col):
     }
 
 
-def plot_event_study(event_study_df, output_dir):
+def plot_event_study(event_study_df, output_dir, dpi=100):
     """Plot Event Study figure."""
     if event_study_df is None or len(event_study_df) == 0:
         return
@@ -276,12 +474,12 @@ def plot_event_study(event_study_df, output_dir):
         ax.axvspan(pre_times.min() - 0.5, -0.5, alpha=0.1, color='gray')
 
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'event_study.png'), dpi=150, bbox_inches='tight')
+    plt.savefig(os.path.join(output_dir, 'event_study.png'), dpi=dpi)
     plt.close()
     print(f"Event study plot saved to {os.path.join(output_dir, 'event_study.png')}")
 
 
-def plot_did_means(result, output_dir):
+def plot_did_means(result, output_dir, dpi=100):
     """Plot DID group-time means."""
     if result is None:
         return
@@ -305,7 +503,7 @@ def plot_did_means(result, output_dir):
     ax.set_ylim(0, max(means) * 1.2)
 
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'did_means.png'), dpi=150, bbox_inches='tight')
+    plt.savefig(os.path.join(output_dir, 'did_means.png'), dpi=dpi)
     plt.close()
     print(f"DID means plot saved to {os.path.join(output_dir, 'did_means.png')}")
 
@@ -316,107 +514,118 @@ def generate_report(df, treatment_col, outcome_col, time_col, group_col,
     """Generate Markdown report."""
     report_path = os.path.join(output_dir, 'DID_Analysis_Report.md')
 
-    with open(report_path, 'w') as f:
-        f.write(f"# DID (Difference-in-Differences) Analysis Report\n\n")
-        f.write(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-        # 1. Data Overview
-        f.write("## 1. Data Overview\n\n")
-        f.write(f"| Item | Value |\n")
-        f.write(f"|------|-------|\n")
-        f.write(f"| Observations | {did_result['n_observations']:,} |\n")
-        f.write(f"| Treatment Column | `{treatment_col}` |\n")
-        f.write(f"| Outcome Column | `{outcome_col}` |\n")
-        f.write(f"| Time Column | `{time_col}` |\n")
-        f.write(f"| Group Column | `{group_col}` |\n")
-        f.write(f"| Post Threshold | {did_result['post_threshold']} |\n\n")
-
-        # 2. DID Results
-        f.write("## 2. DID Regression Results\n\n")
-        f.write("Model: `Y = β0 + β1·treated + β2·post + β3·(treated × post) + ε`\n\n")
-        f.write("**Key Parameter (β3) = DID Estimate**\n\n")
-
-        sig = "***" if did_result['did_pvalue'] < 0.001 else "**" if did_result['did_pvalue'] < 0.01 else "*" if did_result['did_pvalue'] < 0.05 else ""
-
-        f.write(f"| Metric | Value |\n")
-        f.write(f"|-------|-------|\n")
-        f.write(f"| DID Estimate | {did_result['did_estimate']:+.4f}{sig} |\n")
-        f.write(f"| Standard Error | {did_result['did_se']:.4f} |\n")
-        f.write(f"| p-value | {did_result['did_pvalue']:.4f} |\n")
-        f.write(f"| 95% CI | [{did_result['did_ci'][0]:.4f}, {did_result['did_ci'][1]:.4f}] |\n\n")
-
-        if sig:
-            significance_note = "Significant" if did_result['did_pvalue'] < 0.05 else "Not Significant"
-            f.write(f"**Interpretation**: The treatment effect is {significance_note} at 5% level.\n\n")
-
-        # 3. Group-Time Means
-        f.write("## 3. Group-Time Means\n\n")
-        f.write(f"| Group | {outcome_col} Mean |\n")
-        f.write(f"|-------|-----------------|\n")
-        f.write(f"| Treated (Pre) | {did_result['treated_pre']:.4f} |\n")
-        f.write(f"| Treated (Post) | {did_result['treated_post']:.4f} |\n")
-        f.write(f"| Control (Pre) | {did_result['control_pre']:.4f} |\n")
-        f.write(f"| Control (Post) | {did_result['control_post']:.4f} |\n\n")
-
-        f.write("**Calculation Check**:\n")
-        f.write(f"- DID = ({did_result['treated_post']:.4f} - {did_result['treated_pre']:.4f}) - ({did_result['control_post']:.4f} - {did_result['control_pre']:.4f})\n")
-        f.write(f"- DID = {(did_result['treated_post'] - did_result['treated_pre']):.4f} - {(did_result['control_post'] - did_result['control_pre']):.4f} = {did_result['did_estimate']:.4f}\n\n")
-
-        # 4. Parallel Trends Test
-        f.write("## 4. Parallel Trends Test\n\n")
-        if parallel_trends_result:
-            is_balanced = parallel_trends_result['is_balanced']
-            f.write(f"| Metric | Value |\n")
-            f.write(f"|-------|-------|\n")
-            f.write(f"| Pre-period Treated Mean | {parallel_trends_result['pre_trends'].get(1, 'N/A')} |\n")
-            f.write(f"| Pre-period Control Mean | {parallel_trends_result['pre_trends'].get(0, 'N/A')} |\n")
-            f.write(f"| Pre-period Trend Difference | {parallel_trends_result['trend_difference']:.4f} |\n\n")
-
-            status = "✅ PASSED" if is_balanced else "⚠️ CAUTION"
-            f.write(f"**Parallel Trends Assumption**: {status}\n\n")
-            if is_balanced:
-                f.write("Pre-treatment trends are approximately parallel between treatment and control groups.\n\n")
-            else:
-                f.write("Pre-treatment trends show some difference. Interpretation should be cautious.\n\n")
+    parts = []
+    parts.append(f"# DID (Difference-in-Differences) Analysis Report\n\n")
+    parts.append(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+    # 1. Data Overview
+    parts.append("## 1. Data Overview\n\n")
+    parts.append(f"| Item | Value |\n")
+    parts.append(f"|------|-------|\n")
+    parts.append(f"| Observations | {did_result['n_observations']:,} |\n")
+    parts.append(f"| Treatment Column | `{treatment_col}` |\n")
+    parts.append(f"| Outcome Column | `{outcome_col}` |\n")
+    parts.append(f"| Time Column | `{time_col}` |\n")
+    parts.append(f"| Group Column | `{group_col}` |\n")
+    parts.append(f"| Post Threshold | {did_result['post_threshold']} |\n\n")
+
+    # 2. DID Results
+    parts.append("## 2. DID Regression Results\n\n")
+    parts.append("Model: `Y = β0 + β1·treated + β2·post + β3·(treated × post) + ε`\n\n")
+    parts.append("**Key Parameter (β3) = DID Estimate**\n\n")
+
+    sig = "***" if did_result['did_pvalue'] < 0.001 else "**" if did_result['did_pvalue'] < 0.01 else "*" if did_result['did_pvalue'] < 0.05 else ""
+
+    parts.append(f"| Metric | Value |\n")
+    parts.append(f"|-------|-------|\n")
+    parts.append(f"| DID Estimate | {did_result['did_estimate']:+.4f}{sig} |\n")
+    parts.append(f"| Standard Error | {did_result['did_se']:.4f} |\n")
+    parts.append(f"| p-value | {did_result['did_pvalue']:.4f} |\n")
+    parts.append(f"| 95% CI | [{did_result['did_ci'][0]:.4f}, {did_result['did_ci'][1]:.4f}] |\n\n")
+
+    if sig:
+        significance_note = "Significant" if did_result['did_pvalue'] < 0.05 else "Not Significant"
+        parts.append(f"**Interpretation**: The treatment effect is {significance_note} at 5% level.\n\n")
+
+    # 3. Group-Time Means
+    parts.append("## 3. Group-Time Means\n\n")
+    parts.append(f"| Group | {outcome_col} Mean |\n")
+    parts.append(f"|-------|-----------------|\n")
+    parts.append(f"| Treated (Pre) | {did_result['treated_pre']:.4f} |\n")
+    parts.append(f"| Treated (Post) | {did_result['treated_post']:.4f} |\n")
+    parts.append(f"| Control (Pre) | {did_result['control_pre']:.4f} |\n")
+    parts.append(f"| Control (Post) | {did_result['control_post']:.4f} |\n\n")
+
+    parts.append("**Calculation Check**:\n")
+    parts.append(f"- DID = ({did_result['treated_post']:.4f} - {did_result['treated_pre']:.4f}) - ({did_result['control_post']:.4f} - {did_result['control_pre']:.4f})\n")
+    treated_change = did_result['treated_post'] - did_result['treated_pre']
+    control_change = did_result['control_post'] - did_result['control_pre']
+    if did_result.get('streamed'):
+        # Exact full-file means, while the regression estimate comes from the sampled rows
+        parts.append(f"- DID = {treated_change:.4f} - {control_change:.4f} = {treated_change - control_change:.4f} "
+                     f"(full-file means; the regression estimate {did_result['did_estimate']:+.4f} uses the sample)\n\n")
+    else:
+        parts.append(f"- DID = {treated_change:.4f} - {control_change:.4f} = {did_result['did_estimate']:.4f}\n\n")
+
+    # 4. Parallel Trends Test
+    parts.append("## 4. Parallel Trends Test\n\n")
+    if parallel_trends_result:
+        is_balanced = parallel_trends_result['is_balanced']
+        parts.append(f"| Metric | Value |\n")
+        parts.append(f"|-------|-------|\n")
+        parts.append(f"| Pre-period Treated Mean | {parallel_trends_result['pre_trends'].get(1, 'N/A')} |\n")
+        parts.append(f"| Pre-period Control Mean | {parallel_trends_result['pre_trends'].get(0, 'N/A')} |\n")
+        parts.append(f"| Pre-period Trend Difference | {parallel_trends_result['trend_difference']:.4f} |\n\n")
+
+        status = "✅ PASSED" if is_balanced else "⚠️ CAUTION"
+        parts.append(f"**Parallel Trends Assumption**: {status}\n\n")
+        if is_balanced:
+            parts.append("Pre-treatment trends are approximately parallel between treatment and control groups.\n\n")
         else:
-            f.write("Parallel trends test could not be performed (insufficient pre-treatment data).\n\n")
-
-        # 5. Event Study (if available)
-        if event_study_df is not None and len(event_study_df) > 0:
-            f.write("## 5. Event Study: Dynamic Effects\n\n")
-            f.write("![Event Study](event_study.png)\n\n")
-            f.write("| Relative Time | Coefficient | SE | p-value |\n")
-            f.write(f"|----------------|-------------|----|---------|")
-            for _, row in event_study_df.iterrows():
-                f.write(f"\n| {row['relative_time']} | {row['coefficient']:+.4f} | {row['se']:.4f} | {row['pvalue']:.4f} |")
-            f.write("\n\n")
-
-        # 6. Business Interpretation
-        f.write("## 6. Business Interpretation\n\n")
-        if did_result['did_pvalue'] < 0.05:
-            effect_direction = "提升" if did_result['did_estimate'] > 0 else "降低"
-            f.write(f"### Key Finding\n\n")
-            f.write(f"策略/政策变化导致 **{outcome_col}** {effect_direction}了 **{abs(did_result['did_estimate'])*100:.2f}%**。\n\n")
-            f.write(f"95%置信区间: [{did_result['did_ci'][0]*100:.2f}%, {did_result['did_ci'][1]*100:.2f}%]\n\n")
-            f.write("### Recommendations\n\n")
-            if did_result['did_estimate'] > 0:
-                f.write("- ✅ 建议推广该策略到其他渠道/用户群\n")
-                f.write("- ✅ 预期可带来类似幅度的效果提升\n")
-            else:
-                f.write("- ⚠️ 需要进一步分析效果为负的原因\n")
-                f.write("- ⚠️ 考虑回滚或优化策略\n")
+            parts.append("Pre-treatment trends show some difference. Interpretation should be cautious.\n\n")
+    else:
+        parts.append("Parallel trends test could not be performed (insufficient pre-treatment data).\n\n")
+
+    # 5. Event Study (if available)
+    if event_study_df is not None and len(event_study_df) > 0:
+        parts.append("## 5. Event Study: Dynamic Effects\n\n")
+        parts.append("![Event Study](event_study.png)\n\n")
+        parts.append("| Relative Time | Coefficient | SE | p-value |\n")
+        parts.append(f"|----------------|-------------|----|---------|")
+        parts.append("".join(
+            f"\n| {r.relative_time} | {r.coefficient:+.4f} | {r.se:.4f} | {r.pvalue:.4f} |"
+            for r in event_study_df.itertuples()))
+        parts.append("\n\n")
+
+    # 6. Business Interpretation
+    parts.append("## 6. Business Interpretation\n\n")
+    if did_result['did_pvalue'] < 0.05:
+        effect_direction = "提升" if did_result['did_estimate'] > 0 else "降低"
+        parts.append(f"### Key Finding\n\n")
+        parts.append(f"策略/政策变化导致 **{outcome_col}** {effect_direction}了 **{abs(did_result['did_estimate'])*100:.2f}%**。\n\n")
+        parts.append(f"95%置信区间: [{did_result['did_ci'][0]*100:.2f}%, {did_result['did_ci'][1]*100:.2f}%]\n\n")
+        parts.append("### Recommendations\n\n")
+        if did_result['did_estimate'] > 0:
+            parts.append("- ✅ 建议推广该策略到其他渠道/用户群\n")
+            parts.append("- ✅ 预期可带来类似幅度的效果提升\n")
         else:
-            f.write("### Key Finding\n\n")
-            f.write(f"策略/政策变化的效应在统计上**不显著**（p={did_result['did_pvalue']:.4f}）。\n\n")
-            f.write("### Recommendations\n\n")
-            f.write("- ⚠️ 当前数据无法证明策略有效\n")
-            f.write("- 📊 建议收集更多数据或延长观察期\n")
-
-        f.write("\n---\n\n")
-        f.write("## 7. Technical Notes\n\n")
-        f.write("- Standard errors are clustered by group\n")
-        f.write("- DID assumes parallel trends in the absence of treatment\n")
-        f.write("- Results should be validated with additional robustness checks\n")
+            parts.append("- ⚠️ 需要进一步分析效果为负的原因\n")
+            parts.append("- ⚠️ 考虑回滚或优化策略\n")
+    else:
+        parts.append("### Key Finding\n\n")
+        parts.append(f"策略/政策变化的效应在统计上**不显著**（p={did_result['did_pvalue']:.4f}）。\n\n")
+        parts.append("### Recommendations\n\n")
+        parts.append("- ⚠️ 当前数据无法证明策略有效\n")
+        parts.append("- 📊 建议收集更多数据或延长观察期\n")
+
+    parts.append("\n---\n\n")
+    parts.append("## 7. Technical Notes\n\n")
+    parts.append("- Standard errors are clustered by group\n")
+    parts.append("- DID assumes parallel trends in the absence of treatment\n")
+    parts.append("- Results should be validated with additional robustness checks\n")
+
+    with open(report_path, 'w') as f:
+        f.write("".join(parts))
 
     print(f"Report saved to {report_path}")
     return report_path
@@ -437,6 +646,10 @@ def main():
                         help="Comma-separated list of control variables")
     parser.add_argument("--output", "-o", default=None,
                         help="Output directory for report and plots")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the CSV in chunks of this many rows (for files larger than RAM)")
+    parser.add_argument("--sample-size", type=int, default=200_000,
+                        help="Rows sampled for the regressions when streaming")
 
     args = parser.parse_args()
 
@@ -458,32 +671,62 @@ def main():
     # Load data
     print(f"Loading data from {args.file_path}...")
     df = load_and_prepare_data(args.file_path, args.treatment, args.outcome,
-                               args.time, args.group, covariates)
+                               args.time, args.group, covariates,
+                               chunksize=args.chunksize, sample_size=args.sample_size)
     if df is None:
         return
 
-    print(f"Data loaded: {len(df)} rows")
-
-    # Run DID regression
-    print("Running DID regression...")
-    did_result = run_did_regression(df, args.treatment, args.outcome,
-                                    args.time, args.group, covariates)
-    if did_result is None:
-        print("DID regression failed")
-        return
+    if args.chunksize:
+        print(f"Data streamed: {len(df)} sampled rows used for the regressions")
+    else:
+        print(f"Data loaded: {len(df)} rows")
+
+    # Shared time/treatment arrays, derived once for all three analyses
+    post_threshold = treated_val = None
+    if args.chunksize:
+        # Split pre/post at the full-file median time, not the sample's, and take the
+        # treated arm from the file's first row so the sign matches a full load
+        post_threshold = stream_post_threshold(args.file_path, args.time, args.chunksize)
+        treated_val = pd.read_csv(args.file_path, usecols=[args.treatment], nrows=1)[args.treatment].iloc[0]
+    panel = _prep_panel(df, args.treatment, args.outcome, args.time, args.group,
+                        post_threshold=post_threshold, treated_val=treated_val)
+
+    # The three analyses only read the shared panel, so run them concurrently.
+    # Threads rather than processes: the heavy parts are NumPy/LAPACK calls that
+    # release the GIL, and nothing has to be pickled to workers.
+    print("Running DID regression, event study and parallel trends test...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        did_future = executor.submit(run_did_regression, df, args.treatment, args.outcome,
+                                     args.time, args.group, covariates, panel=panel)
+        parallel_trends_future = executor.submit(test_parallel_trends, df, args.treatment, args.outcome,
+                                                 args.time, args.group, panel=panel)
+        if args.chunksize:
+            # Exact full-file group-time means, streamed while the regressions run
+            means_future = executor.submit(stream_group_means, args.file_path, args.treatment,
+                                           args.outcome, args.time, panel.treated_val,
+                                           panel.post_threshold, args.chunksize)
+
+        # The event study stays on the main thread: numba's parallel kernel
+        # (TBB layer) hangs at interpreter exit when launched from a pool worker
+        event_study_df = run_event_study(df, args.treatment, args.outcome,
+                                         args.time, args.group, panel=panel)
+
+        did_result = did_future.result()
+        parallel_trends_result = parallel_trends_future.result()
+
+        if did_result is None:
+            print("DID regression failed")
+            return
+
+        if args.chunksize:
+            # Replace the sample's group-time means with exact full-file ones
+            means = means_future.result()
+            if means is None:
+                return
+            did_result.update(means, streamed=True)
 
     print(f"DID Estimate: {did_result['did_estimate']:+.4f} (p={did_result['did_pvalue']:.4f})")
 
-    # Run event study
-    print("Running event study...")
-    event_study_df = run_event_study(df, args.treatment, args.outcome,
-                                      args.time, args.group)
-
-    # Test parallel trends
-    print("Testing parallel trends...")
-    parallel_trends_result = test_parallel_trends(df, args.treatment, args.outcome,
-                                                   args.time, args.group)
-
     # Generate plots
     plot_did_means(did_result, output_dir)
     if event_study_df is not None:
@@ -2,8 +2,9 @@
 import argparse
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import sys
 from sklearn.model_selection import train_test_split
@@ -11,19 +12,29 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.inspection import permutation_importance
 from sklearn.metrics import classification_report, r2_score, mean_absolute_error
+from _dataset_io import load_dataset
+
+try:
+    import lightgbm as lgb
+except ImportError:
+    lgb = None
 
 # Set style
 plt.style.use('ggplot')
-sns.set_palette("husl")
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'STHeiti', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False
 
-def analyze_drivers(file_path, target_col, output_dir=None, task_type='auto'):
+def analyze_drivers(file_path, target_col, output_dir=None, task_type='auto', n_jobs=1, model_name='rf'):
     """
-    Analyze key drivers of a target variable using Random Forest Permutation Importance.
+    Analyze key drivers of a target variable using Random Forest Permutation Importance,
+    or LightGBM gain importance when model_name='lightgbm'.
     """
+    if model_name == 'lightgbm' and lgb is None:
+        print("Error: lightgbm not installed. Run: pip install lightgbm")
+        return
+
     try:
-        df = pd.read_csv(file_path)
+        df = load_dataset(file_path)
     except Exception as e:
         print(f"Error reading file: {e}")
         return
@@ -39,8 +50,11 @@ def analyze_drivers(file_path, target_col, output_dir=None, task_type='auto'):
 
     # 1. Data Preprocessing
     # Drop useless columns (ID, constant columns)
-    nunique = df.nunique()
-    drop_cols = nunique[nunique <= 1].index.tolist()
+    # Cheap screen first: a column whose first/middle/last rows hold two different
+    # non-null values cannot be constant, so only confirm the rest with a full nunique
+    probes = df.iloc[[0, len(df) // 2, -1]]
+    candidates = [c for c in df.columns if probes[c].nunique() <= 1]
+    drop_cols = [c for c in candidates if df[c].nunique() <= 1]
     if 'EmployeeNumber' in df.columns: drop_cols.append('EmployeeNumber')
     if 'id' in df.columns.str.lower(): drop_cols.extend(df.columns[df.columns.str.lower() == 'id'].tolist())
 
@@ -72,13 +86,15 @@ def analyze_drivers(file_path, target_col, output_dir=None, task_type='auto'):
     # Encode features
     le_dict = {}
     for col in X.select_dtypes(include=['object']).columns:
-        le = LabelEncoder()
-        # Handle new categories in future if needed, but for now fit_transform is fine
-        X[col] = le.fit_transform(X[col].astype(str))
-        le_dict[col] = le
+        # Categorical codes (hash factorize in C); missing values get code -1
+        cat = X[col].astype('category')
+        X[col] = cat.cat.codes.astype(np.int32)
+        le_dict[col] = cat.cat.categories
 
     # Handle NaNs in features (simple fill)
     X = X.fillna(X.median(numeric_only=True)).fillna(0)
+    # Trees split on float32 internally; cast once instead of per fit/predict call
+    X = X.astype(np.float32)
 
     # Encode target for classification
     if task_type == 'classification' and y.dtype == 'object':
@@ -86,14 +102,21 @@ def analyze_drivers(file_path, target_col, output_dir=None, task_type='auto'):
         y = le_target.fit_transform(y)
         print(f"Target classes: {le_target.classes_}")
 
-    # 2. Modeling (Random Forest)
-    # Use fewer estimators and limit depth for faster execution on large datasets
+    # 2. Modeling (Random Forest, or LightGBM on request)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    if task_type == 'classification':
-        model = RandomForestClassifier(n_estimators=50, max_depth=10, random_state=42, class_weight='balanced', n_jobs=1)
+    if model_name == 'lightgbm':
+        # Histogram-based split finding
+        params = dict(n_estimators=200, num_leaves=31, importance_type='gain', random_state=42, n_jobs=n_jobs, verbose=-1)
+        if task_type == 'classification':
+            model = lgb.LGBMClassifier(class_weight='balanced', **params)
+        else:
+            model = lgb.LGBMRegressor(**params)
+    # Use fewer estimators and limit depth for faster execution on large datasets
+    elif task_type == 'classification':
+        model = RandomForestClassifier(n_estimators=50, max_depth=10, random_state=42, class_weight='balanced', n_jobs=n_jobs)
     else:
-        model = RandomForestRegressor(n_estimators=50, max_depth=10, random_state=42, n_jobs=1)
+        model = RandomForestRegressor(n_estimators=50, max_depth=10, random_state=42, n_jobs=n_jobs)
 
     print("Training model...")
     model.fit(X_train, y_train)
@@ -115,26 +138,62 @@ def analyze_drivers(file_path, target_col, output_dir=None, task_type='auto'):
             f.write(f"- **R² Score**: {r2:.4f}\n")
             f.write(f"- **MAE**: {mae:.4f}\n\n")
 
-        # 4. Feature Importance (Permutation)
-        print("Calculating permutation importance (this may take a moment)...")
-        # Optimized: n_jobs=1, n_repeats=3
-        result = permutation_importance(model, X_test, y_test, n_repeats=3, random_state=42, n_jobs=1)
-
-        importance_df = pd.DataFrame({
-            'Feature': X.columns,
-            'Importance': result.importances_mean,
-            'Std': result.importances_std
-        }).sort_values('Importance', ascending=False)
-
-        f.write("## 2. Key Drivers (Permutation Importance)\n\n")
-        f.write("Top factors that influence the target variable:\n\n")
+        # 4. Feature Importance
+        if model_name == 'lightgbm':
+            # Headline ranking from LightGBM's gain importance, as shares; permutation drop only for the top features
+            gain = model.feature_importances_.astype(np.float64)
+            importance_df = pd.DataFrame({
+                'Feature': X.columns,
+                'Importance': gain / gain.sum() if gain.sum() > 0 else gain
+            }).sort_values('Importance', ascending=False)
+            top_k = importance_df.head(10)['Feature'].tolist()
+        else:
+            # Screen with the forest's free impurity importance, then only permute the top features
+            top_k = X.columns[np.argsort(model.feature_importances_)[::-1][:20]].tolist()
+
+        # Score on a fixed row sample (at most 5k) drawn once; estimates get slightly
+        # noisier on large test sets, which n_repeats averages out
+        idx = np.random.default_rng(42).choice(len(X_test), size=min(5000, len(X_test)), replace=False)
+        X_sample, y_sample = X_test.iloc[idx], np.asarray(y_test)[idx]
+
+        def score_top_k(estimator, X_top, y_true):
+            # Re-insert the (permuted) top-k columns into the full feature matrix
+            X_full = X_sample.loc[X_top.index].copy()
+            X_full[top_k] = X_top
+            return estimator.score(X_full, y_true)
+
+        print(f"Calculating permutation importance for top {len(top_k)} features (this may take a moment)...")
+        # Optimized: n_repeats=3, n_jobs=1 by default
+        result = permutation_importance(model, X_sample[top_k], y_sample, scoring=score_top_k,
+                                        n_repeats=3, random_state=42, n_jobs=n_jobs)
+
+        if model_name == 'lightgbm':
+            importance_df['Permutation'] = importance_df['Feature'].map(dict(zip(top_k, result.importances_mean)))
+            importance_df['Std'] = importance_df['Feature'].map(dict(zip(top_k, result.importances_std)))
+            f.write("## 2. Key Drivers (Model Importance)\n\n")
+            f.write("Top factors that influence the target variable "
+                    f"(permutation drop shown for the top {len(top_k)}):\n\n")
+            xlabel = 'Importance (Share of Model Importance)'
+        else:
+            importance_df = pd.DataFrame({
+                'Feature': top_k,
+                'Importance': result.importances_mean,
+                'Std': result.importances_std
+            }).sort_values('Importance', ascending=False)
+            f.write("## 2. Key Drivers (Permutation Importance)\n\n")
+            f.write("Top factors that influence the target variable:\n\n")
+            xlabel = 'Importance (Model Performance Drop)'
         f.write("```\n" + importance_df.head(15).to_string(index=False) + "\n```\n\n")
 
         # Plot Importance
-        plt.figure(figsize=(10, 8))
-        sns.barplot(x='Importance', y='Feature', data=importance_df.head(15), palette='viridis')
+        top_importance = importance_df.head(15)
+        fig, ax = plt.subplots(figsize=(10, 8))
+        ax.barh(top_importance['Feature'], top_importance['Importance'],
+                color=plt.cm.viridis(np.linspace(0, 1, len(top_importance))))
+        ax.invert_yaxis()  # most important at the top
+        ax.set_ylabel('Feature')
         plt.title(f'Top Drivers of {target_col}')
-        plt.xlabel('Importance (Model Performance Drop)')
+        plt.xlabel(xlabel)
         plt.tight_layout()
         plt.savefig(os.path.join(output_dir, "feature_importance.png"))
         plt.close()
@@ -147,19 +206,31 @@ def analyze_drivers(file_path, target_col, output_dir=None, task_type='auto'):
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
         axes = axes.flatten()
 
-        for i, feature in enumerate(top_features):
-            plot_data = df_clean.copy()
-
-            # Limit plot data size for performance
-            if len(plot_data) > 2000:
-                plot_data = plot_data.sample(2000, random_state=42)
+        # Limit plot data size for performance (sampled once for all four panels)
+        plot_data = df_clean
+        if len(plot_data) > 2000:
+            plot_data = plot_data.sample(2000, random_state=42)
 
+        for i, feature in enumerate(top_features):
             if task_type == 'regression':
-                sns.scatterplot(x=feature, y=target_col, data=plot_data, ax=axes[i], alpha=0.6)
+                x = plot_data[feature]
+                if not pd.api.types.is_numeric_dtype(x):
+                    # Text features go on a categorical axis; missing values are left out
+                    x = x.dropna().astype(str)
+                axes[i].scatter(x.to_numpy(), plot_data.loc[x.index, target_col].to_numpy(), alpha=0.6)
+                axes[i].set_xlabel(feature)
+                axes[i].set_ylabel(target_col)
                 axes[i].set_title(f'{feature} vs {target_col}')
             else:
                 if pd.api.types.is_numeric_dtype(plot_data[feature]) and plot_data[feature].nunique() > 10:
-                    sns.boxplot(x=target_col, y=feature, data=plot_data, ax=axes[i])
+                    classes = np.sort(plot_data[target_col].dropna().unique())
+                    target_values = plot_data[target_col].to_numpy()
+                    feature_values = plot_data[feature].to_numpy()
+                    axes[i].boxplot([feature_values[(target_values == c) & ~np.isnan(feature_values)]
+                                     for c in classes])
+                    axes[i].set_xticks(np.arange(1, len(classes) + 1), labels=classes)
+                    axes[i].set_xlabel(target_col)
+                    axes[i].set_ylabel(feature)
                     axes[i].set_title(f'{feature} Distribution by {target_col}')
                 else:
                     ct = pd.crosstab(plot_data[feature], plot_data[target_col], normalize='index')
@@ -180,7 +251,9 @@ if __name__ == "__main__":
     parser.add_argument("target_col", help="Target column to analyze")
     parser.add_argument("--output", "-o", help="Output directory for report")
     parser.add_argument("--type", choices=['auto', 'classification', 'regression'], default='auto', help="Task type")
+    parser.add_argument("--model", choices=['rf', 'lightgbm'], default='rf', help="Model for importance (lightgbm only on request)")
+    parser.add_argument("--n-jobs", type=int, default=1, help="Parallel jobs for model fit and permutation importance (-1 = all cores)")
 
     args = parser.parse_args()
 
-    analyze_drivers(args.file_path, args.target_col, args.output, args.type)
+    analyze_drivers(args.file_path, args.target_col, args.output, args.type, args.n_jobs, args.model)
@@ -2,10 +2,19 @@
 import argparse
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 import sys
+from _dataset_io import load_dataset
+from _dtypes import optimize_dtypes
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
 
 # Set style
 plt.style.use('ggplot')
@@ -13,13 +22,65 @@ sns.set_palette("husl")
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'STHeiti', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False
 
+def _equal_width_bins(values, bins):
+    """
+    Same bins and labels as pd.cut(values, bins) for an integer bin count, but rows
+    are assigned with one np.searchsorted over the edges; the intervals are built
+    once per bin (as the categories), not once per row.
+    """
+    mn, mx = np.nanmin(values), np.nanmax(values)
+    edges = np.linspace(mn, mx, bins + 1)
+    edges[0] -= (mx - mn) * 0.001  # widen the first bin by 0.1% so the minimum falls inside, as pd.cut does
+    codes = np.clip(np.searchsorted(edges, values, side='left') - 1, 0, bins - 1)
+    codes[np.isnan(values)] = -1  # missing values stay out of every bin
+    # Labels with pd.cut's rounding, from the edges alone
+    categories = pd.cut(np.empty(0), bins=edges).categories
+    return pd.Categorical.from_codes(codes, categories=categories, ordered=True)
+
+# Aggregations whose Polars expression matches pandas groupby (null skipping, ddof=1);
+# same-named ones like first, skew or quantile differ and stay on pandas
+_POLARS_AGGS = {'mean', 'sum', 'count', 'min', 'max', 'median', 'std', 'var'}
+
+def _aggregate(df, group_col, target_col, agg_funcs):
+    """
+    Group-and-aggregate with Polars (multi-threaded) when available, else pandas.
+    Returns one row per group, ordered by group key like pandas groupby.
+    """
+    if pl is None or not set(agg_funcs) <= _POLARS_AGGS:
+        return df.groupby(group_col)[target_col].agg(agg_funcs).reset_index()
+
+    # Group categorical keys (pd.cut intervals, text categories) on their integer codes
+    keys = df[group_col]
+    is_categorical = isinstance(keys.dtype, pd.CategoricalDtype)
+    if is_categorical:
+        keys = keys.cat.codes
+
+    values = df[target_col].to_numpy()
+    if values.dtype == np.float32:
+        values = values.astype(np.float64)  # accumulate in double precision, as pandas does
+
+    grouped = (
+        pl.DataFrame({group_col: keys.to_numpy(), target_col: values},
+                     nan_to_null=True)
+        .lazy()
+        .group_by(group_col)
+        .agg([getattr(pl.col(target_col), func)().alias(func) for func in agg_funcs])
+        .sort(group_col)
+        .collect()
+        .to_pandas()
+    )
+
+    if is_categorical:
+        grouped[group_col] = pd.Categorical.from_codes(grouped[group_col], dtype=df[group_col].dtype)
+    return grouped
+
 def analyze_groups(file_path, group_col, target_col, agg_funcs=['mean', 'sum', 'count'], bins=None, top_n=10, output_dir=None):
     """
     Generic script to analyze a target variable grouped by another variable.
     Supports automatic binning for numerical group columns.
     """
     try:
-        df = pd.read_csv(file_path)
+        df = optimize_dtypes(load_dataset(file_path, columns=[group_col, target_col]))
     except Exception as e:
         print(f"Error reading file: {e}")
         return
@@ -46,16 +107,12 @@ def analyze_groups(file_path, group_col, target_col, agg_funcs=['mean', 'sum', '
             bins = 10
         print(f"Binning numeric column '{group_col}' into {bins} bins...")
         group_col = f"{original_group_col}_binned"
-        try:
-            df[group_col] = pd.cut(df[original_group_col], bins=int(bins))
-        except:
-             df[group_col] = pd.cut(df[original_group_col], bins=int(bins), duplicates='drop')
+        df[group_col] = _equal_width_bins(df[original_group_col].to_numpy(dtype=np.float64), int(bins))
 
     # 2. Group & Aggregate
     print(f"Grouping by '{group_col}' and aggregating '{target_col}'...")
 
-    # Map string agg_funcs to actual functions if needed, or rely on pandas string aliases
-    grouped = df.groupby(group_col)[target_col].agg(agg_funcs).reset_index()
+    grouped = _aggregate(df, group_col, target_col, agg_funcs)
 
     # Rename columns for clarity
     grouped.columns = [group_col] + [f"{target_col}_{func}" for func in agg_funcs]
@@ -2,10 +2,15 @@
 import argparse
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 import sys
+import warnings
+from _dataset_io import load_dataset, RowSampler
+from _dtypes import optimize_dtypes
 
 # Set style
 plt.style.use('ggplot')
@@ -13,12 +18,169 @@ sns.set_palette("husl")
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'STHeiti', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False
 
-def analyze_data(file_path, output_dir=None, target_col=None):
+def _pairwise_corr(M):
+    """
+    Pearson correlation of the columns of M over pairwise-complete rows (same as
+    DataFrame.corr), computed with a handful of matrix products instead of a
+    per-pair loop. Columns are centered first to keep the sums well conditioned.
+    """
+    mask = ~np.isnan(M)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Z = np.where(mask, M - np.nanmean(M, axis=0), 0.0)
+        if mask.all():
+            return np.corrcoef(Z, rowvar=False)
+
+        W = mask.astype(np.float64)
+        n = W.T @ W               # rows where both columns are present
+        sx = Z.T @ W              # sum of column i over those rows
+        sxx = (Z * Z).T @ W       # sum of squares of column i over those rows
+        sxy = Z.T @ Z
+        cov = sxy - sx * sx.T / n
+        var_x = sxx - sx ** 2 / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[n < 2] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+def _hist_with_kde(ax, values, bins=50):
+    """
+    Histogram via np.histogram + ax.stairs, with a KDE-style curve obtained by
+    smoothing the bin counts with a Gaussian kernel (Scott's bandwidth) instead
+    of evaluating a KDE at every data point.
+    """
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return
+    counts, edges = np.histogram(values, bins=bins)
+    ax.stairs(counts, edges, fill=True, alpha=0.6)
+
+    # Bandwidth in bin units; skip the curve when the data are (nearly) constant
+    width = edges[1] - edges[0]
+    sigma = 1.06 * values.std() * len(values) ** (-1 / 5) / width if width > 0 else 0
+    if sigma >= 0.5:
+        x = np.arange(-int(np.ceil(3 * sigma)), int(np.ceil(3 * sigma)) + 1)
+        kernel = np.exp(-0.5 * (x / sigma) ** 2)
+        smooth = np.convolve(counts, kernel / kernel.sum(), mode='same')
+        ax.plot((edges[:-1] + edges[1:]) / 2, smooth)
+
+def _summary(df, target_col=None):
+    """Overview statistics of an in-memory DataFrame."""
+    # One vectorized 64-bit hash per row (column-wise in C) instead of df.duplicated()'s
+    # row factorization; exact up to hash collisions, as in the streaming path
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    numeric = df.select_dtypes(include=[np.number])
+
+    if len(numeric.columns) > 0:
+        # describe() and var() for all numeric columns from one array, column-wise NumPy reductions
+        arr = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        count = (~np.isnan(arr)).sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+            var = np.where(count > 1, np.nanvar(arr, axis=0, ddof=1), np.nan)
+            mean = np.nanmean(arr, axis=0)
+            q = np.nanpercentile(arr, [0, 25, 50, 75, 100], axis=0)
+        describe = pd.DataFrame({'count': count.astype(np.float64), 'mean': mean, 'std': np.sqrt(var),
+                                 'min': q[0], '25%': q[1], '50%': q[2], '75%': q[3], 'max': q[4]},
+                                index=numeric.columns)
+    else:
+        describe, var = df.describe().T, []
+
+    return {
+        'rows': len(df),
+        'missing': int(df.isnull().sum().sum()),
+        'duplicates': len(row_hashes) - len(np.unique(row_hashes)),
+        'describe': describe,
+        'variances': pd.Series(var, index=numeric.columns, dtype=np.float64),
+        'target_counts': df[target_col].value_counts() if target_col in df.columns else None,
+    }
+
+def _streaming_summary(file_path, chunksize, sample_size, target_col=None, seed=42):
+    """
+    One pass over the CSV in chunks, holding O(chunk) rows in memory. The exact
+    duplicate count still keeps an 8-byte hash per row, so memory grows as O(rows).
+    Row/missing/duplicate counts, count/mean/std/min/max (Chan's parallel Welford
+    merge) and target counts are exact; quartiles come from a uniform random
+    sample of at most sample_size rows, which is returned for the plots.
+    """
+    sampler = RowSampler(sample_size, seed)
+    rows = missing = 0
+    hashes = []
+    target_counts = None
+    non_numeric = set()
+    n = mean = m2 = vmin = vmax = None
+
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        if n is None:
+            columns = chunk.columns
+            n, mean, m2 = (np.zeros(len(columns)) for _ in range(3))
+            vmin, vmax = np.full(len(columns), np.nan), np.full(len(columns), np.nan)
+
+        rows += len(chunk)
+        missing += int(chunk.isnull().sum().sum())
+        # 8 bytes per row instead of the row itself; duplicates are counted at the end
+        hashes.append(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+        if target_col in chunk.columns:
+            counts = chunk[target_col].value_counts()
+            target_counts = counts if target_counts is None else target_counts.add(counts, fill_value=0)
+
+        # Merge this chunk's per-column count/mean/M2 into the running totals
+        num = chunk.select_dtypes(include=[np.number])
+        non_numeric.update(columns.difference(num.columns))
+        pos = columns.get_indexer(num.columns)
+        X = num.to_numpy(dtype=np.float64, na_value=np.nan)
+        c_n = (~np.isnan(X)).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            c_mean = np.where(c_n > 0, np.nansum(X, axis=0) / c_n, 0.0)
+            c_m2 = np.nansum((X - c_mean) ** 2, axis=0)
+            total = n[pos] + c_n
+            w = np.where(total > 0, c_n / total, 0.0)
+        delta = c_mean - mean[pos]
+        mean[pos] += delta * w
+        m2[pos] += c_m2 + delta ** 2 * n[pos] * w
+        n[pos] = total
+        vmin[pos] = np.fmin(vmin[pos], np.fmin.reduce(X, axis=0))
+        vmax[pos] = np.fmax(vmax[pos], np.fmax.reduce(X, axis=0))
+
+        sampler.add(chunk)
+
+    sample = sampler.result()
+
+    keep = [i for i, c in enumerate(columns) if c not in non_numeric]
+    num_cols = columns[keep]
+    n, mean, m2 = n[keep], mean[keep], m2[keep]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = np.where(n > 1, m2 / (n - 1), np.nan)
+        mean = np.where(n > 0, mean, np.nan)
+    quartiles = sample[num_cols].quantile([0.25, 0.5, 0.75]).T
+    describe = pd.DataFrame({'count': n, 'mean': mean, 'std': np.sqrt(var), 'min': vmin[keep],
+                             '25%': quartiles[0.25], '50%': quartiles[0.5], '75%': quartiles[0.75],
+                             'max': vmax[keep]}, index=num_cols)
+
+    all_hashes = np.concatenate(hashes)
+    summary = {
+        'rows': rows,
+        'missing': missing,
+        'duplicates': len(all_hashes) - len(np.unique(all_hashes)),
+        'describe': describe,
+        'variances': pd.Series(var, index=num_cols),
+        'target_counts': (target_counts.astype(np.int64).sort_values(ascending=False)
+                          if target_counts is not None else None),
+    }
+    return sample, summary
+
+def analyze_data(file_path, output_dir=None, target_col=None, chunksize=None, sample_size=200_000):
     """
     Perform automatic EDA on a dataset.
+
+    With chunksize set, the file is streamed: the overview statistics are exact,
+    while quartiles, correlations and plots use a random sample of sample_size rows.
     """
     try:
-        df = pd.read_csv(file_path)
+        if chunksize:
+            df, summary = _streaming_summary(file_path, chunksize, sample_size, target_col)
+            df = optimize_dtypes(df)
+        else:
+            df = optimize_dtypes(load_dataset(file_path))
+            summary = _summary(df, target_col)
     except Exception as e:
         print(f"Error reading file: {e}")
         return
@@ -37,24 +199,28 @@ def analyze_data(file_path, output_dir=None, target_col=None):
 
         # 1. Basic Info
         f.write("## 1. Data Overview\n\n")
-        f.write(f"- **Rows**: {df.shape[0]:,}\n")
+        f.write(f"- **Rows**: {summary['rows']:,}\n")
         f.write(f"- **Columns**: {df.shape[1]}\n")
-        f.write(f"- **Missing Values**: {df.isnull().sum().sum():,}\n")
-        f.write(f"- **Duplicate Rows**: {df.duplicated().sum():,} ({df.duplicated().mean()*100:.2f}%)\n\n")
+        f.write(f"- **Missing Values**: {summary['missing']:,}\n")
+        f.write(f"- **Duplicate Rows**: {summary['duplicates']:,} "
+                f"({summary['duplicates'] / max(summary['rows'], 1) * 100:.2f}%)\n")
+        if chunksize:
+            f.write(f"- **Sampled Rows**: {len(df):,} (quartiles, correlations and plots)\n")
+        f.write("\n")
 
         f.write("### Column Types\n")
         f.write("```\n" + df.dtypes.to_string() + "\n```\n\n")
 
         # 2. Descriptive Statistics
         f.write("## 2. Descriptive Statistics\n\n")
-        f.write("```\n" + df.describe().T.to_string() + "\n```\n\n")
+        f.write("```\n" + summary['describe'].to_string() + "\n```\n\n")
 
         # 3. Target Variable Analysis (if provided)
         if target_col and target_col in df.columns:
             f.write(f"## 3. Target Variable Analysis: `{target_col}`\n\n")
 
             # Check for imbalance
-            val_counts = df[target_col].value_counts()
+            val_counts = summary['target_counts']
             f.write("### Class Distribution\n")
             f.write("```\n" + val_counts.to_frame().to_string() + "\n```\n\n")
 
@@ -75,7 +241,7 @@ def analyze_data(file_path, output_dir=None, target_col=None):
             f.write("![Target Distribution](target_distribution.png)\n\n")
 
             # Imbalance warning
-            min_class_pct = val_counts.min() / len(df)
+            min_class_pct = val_counts.min() / summary['rows']
             if min_class_pct < 0.1:
                 f.write("> ⚠️ **WARNING**: Extreme class imbalance detected. "
                        f"Minority class is only {min_class_pct*100:.2f}%. "
@@ -87,7 +253,8 @@ def analyze_data(file_path, output_dir=None, target_col=None):
             f.write("## 4. Correlation Analysis\n\n")
 
             # Calculate correlation matrix
-            corr = df[num_cols].corr()
+            corr_np = _pairwise_corr(df[num_cols].to_numpy(dtype=np.float64, na_value=np.nan))
+            corr = pd.DataFrame(corr_np, index=num_cols, columns=num_cols)
 
             # Plot heatmap
             plt.figure(figsize=(12, 10))
@@ -101,9 +268,14 @@ def analyze_data(file_path, output_dir=None, target_col=None):
 
             # Top correlations
             f.write("### Top Correlations\n")
-            corr_unstack = corr.abs().unstack()
-            corr_unstack = corr_unstack[corr_unstack < 1].sort_values(ascending=False)
-            top_corr = corr_unstack.head(10).to_frame(name='Correlation')
+            # Each pair once (upper triangle); partial top-k selection, then sort just those
+            iu, ju = np.triu_indices_from(corr_np, k=1)
+            flat = np.abs(corr_np[iu, ju])
+            keep = np.flatnonzero(flat < 1)  # also drops NaN pairs
+            top = keep[np.argpartition(-flat[keep], 10)[:10]] if len(keep) > 10 else keep
+            top = top[np.argsort(-flat[top], kind='stable')]
+            top_corr = pd.DataFrame({'Correlation': flat[top]},
+                                    index=pd.MultiIndex.from_arrays([num_cols[iu[top]], num_cols[ju[top]]]))
             f.write("```\n" + top_corr.to_string() + "\n```\n\n")
 
         # 5. Distribution Plots (Top 6 numerical columns by variance)
@@ -111,16 +283,21 @@ def analyze_data(file_path, output_dir=None, target_col=None):
             f.write("## 5. Numerical Distributions (Top Variables)\n\n")
 
             # Select top columns by variance to avoid plotting too many
-            variances = df[num_cols].var().sort_values(ascending=False)
-            top_vars = variances.head(6).index
+            # Partial selection of the 6 largest (NaN variances rank last), then order just those
+            v = np.nan_to_num(summary['variances'].reindex(num_cols).to_numpy(), nan=-np.inf)
+            top = np.argpartition(-v, 5)[:6] if len(v) > 6 else np.arange(len(v))
+            top_vars = num_cols[top[np.argsort(-v[top], kind='stable')]]
 
             fig, axes = plt.subplots(2, 3, figsize=(15, 10))
             axes = axes.flatten()
 
+            values = df[top_vars].to_numpy(dtype=np.float64, na_value=np.nan)
             for i, col in enumerate(top_vars):
                 if i < len(axes):
-                    sns.histplot(data=df, x=col, kde=True, ax=axes[i])
+                    _hist_with_kde(axes[i], values[:, i])
                     axes[i].set_title(f'Distribution of {col}')
+                    axes[i].set_xlabel(col)
+                    axes[i].set_ylabel('Count')
 
             plt.tight_layout()
             plt.savefig(os.path.join(output_dir, "numerical_distributions.png"))
@@ -135,7 +312,12 @@ if __name__ == "__main__":
     parser.add_argument("file_path", help="Path to the CSV file")
     parser.add_argument("--output", "-o", help="Output directory for report")
     parser.add_argument("--target", "-t", help="Target column name for supervised analysis")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the CSV in chunks of this many rows (for files larger than RAM; "
+                             "duplicate counting still keeps 8 bytes per row)")
+    parser.add_argument("--sample-size", type=int, default=200_000,
+                        help="Rows sampled for quartiles, correlations and plots when streaming")
 
     args = parser.parse_args()
 
-    analyze_data(args.file_path, args.output, args.target)
+    analyze_data(args.file_path, args.output, args.target, args.chunksize, args.sample_size)
@@ -2,11 +2,20 @@
 import argparse
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 from prophet import Prophet
 import holidays
 import os
+from _dataset_io import load_dataset
+from _dtypes import optimize_dtypes
+
+try:
+    from joblib import Memory
+except ImportError:
+    Memory = None
 
 # Set style
 plt.style.use('ggplot')
@@ -14,13 +23,25 @@ sns.set_palette("husl")
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'STHeiti', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False
 
+def _fit_prophet(daily_df):
+    """Fit the daily Prophet model (trend, yearly/weekly seasonality, US holidays)."""
+    model = Prophet(yearly_seasonality=True, weekly_seasonality=True, daily_seasonality=False)
+    model.add_country_holidays(country_name='US')
+    model.fit(daily_df)
+    return model
+
+# Reuse fitted models across runs: joblib keys the cache on a hash of the daily
+# frame, so any change to the data (or target column) triggers a refit
+if Memory is not None:
+    _fit_prophet = Memory('.cache_forecast', verbose=0).cache(_fit_prophet)
+
 def forecast_timeseries(file_path, target_col, datetime_col='Datetime', output_dir=None):
     """
     Perform time series analysis and forecasting using Prophet.
     Includes hourly trend, holiday analysis, and component decomposition.
     """
     try:
-        df = pd.read_csv(file_path)
+        df = optimize_dtypes(load_dataset(file_path, columns=[datetime_col, target_col]))
     except Exception as e:
         print(f"Error reading file: {e}")
         return
@@ -53,12 +74,14 @@ def forecast_timeseries(file_path, target_col, datetime_col='Datetime', output_d
     plt.xticks(range(0, 24))
     plt.tight_layout()
     plt.savefig(f'{output_dir}/hourly_trend.png')
+    plt.close()
 
     # 3. Holiday Analysis
     print("Analyzing holiday effects...")
-    us_holidays = holidays.US()
-    df['Date'] = df[datetime_col].dt.date
-    df['IsHoliday'] = df['Date'].apply(lambda x: x in us_holidays)
+    # Expand the holiday calendar once for the covered years, then match whole days in C
+    years = range(df[datetime_col].dt.year.min(), df[datetime_col].dt.year.max() + 1)
+    holiday_dates = np.array(sorted(holidays.US(years=years).keys()), dtype='datetime64[D]')
+    df['IsHoliday'] = np.isin(df[datetime_col].to_numpy().astype('datetime64[D]'), holiday_dates)
 
     holiday_stats = df.groupby('IsHoliday')[target_col].agg(['mean', 'count', 'std'])
     print("\nHoliday vs Non-Holiday Consumption:")
@@ -70,30 +93,42 @@ def forecast_timeseries(file_path, target_col, datetime_col='Datetime', output_d
     plt.xticks([0, 1], ['Non-Holiday', 'Holiday'])
     plt.tight_layout()
     plt.savefig(f'{output_dir}/holiday_effect.png')
+    plt.close()
 
     # 4. Prophet Modeling
-    print("\nTraining Prophet model (this may take a minute)...")
-    model = Prophet(yearly_seasonality=True, weekly_seasonality=True, daily_seasonality=True)
-    model.add_country_holidays(country_name='US')
-    model.fit(prophet_df)
-
-    # Forecast 30 days (720 hours)
-    future = model.make_future_dataframe(periods=720, freq='H')
+    # Fit trend/yearly/weekly/holiday effects on daily means (1/24 of the rows); the
+    # diurnal cycle is added back afterwards as the 24-value hourly profile
+    print("\nTraining Prophet model on daily means...")
+    daily_df = prophet_df.set_index('ds')[['y']].resample('D').mean().dropna().reset_index()
+    model = _fit_prophet(daily_df)
+
+    # Forecast 30 days
+    future = model.make_future_dataframe(periods=30, freq='D')
     forecast = model.predict(future)
 
-    # Plot Components (Trend, Weekly, Daily, Yearly)
+    # Hourly forecast (720 hours): daily prediction + hour-of-day offset from the mean
+    hourly_profile = hourly_avg - df[target_col].mean()
+    horizon = pd.date_range(df[datetime_col].max() + pd.Timedelta(hours=1), periods=720, freq='h')
+    daily_yhat = forecast.set_index('ds')['yhat']
+    hourly_yhat = (daily_yhat.reindex(horizon.normalize()).to_numpy()
+                   + hourly_profile.reindex(horizon.hour).fillna(0).to_numpy())
+
+    # Plot Components (Trend, Holidays, Weekly, Yearly; the daily cycle is hourly_trend.png)
     print("Plotting forecast components...")
     fig1 = model.plot_components(forecast)
     plt.tight_layout()
     plt.savefig(f'{output_dir}/forecast_components.png')
+    plt.close()
 
     # Plot Forecast
     fig2 = model.plot(forecast)
+    fig2.gca().plot(horizon, hourly_yhat, color='#ff7f0e', linewidth=0.6, alpha=0.8, label='Hourly forecast')
     plt.title(f'Forecast for {target_col}')
     plt.xlabel('Date')
     plt.ylabel(target_col)
     plt.tight_layout()
     plt.savefig(f'{output_dir}/forecast_plot.png')
+    plt.close()
 
     print(f"\nAnalysis complete. Results saved to: {output_dir}")
 
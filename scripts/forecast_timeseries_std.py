@@ -2,24 +2,85 @@
 import argparse
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
-from statsmodels.tsa.seasonal import seasonal_decompose
+from collections import namedtuple
+from scipy.signal import fftconvolve
+from _dataset_io import load_dataset
+from _dtypes import optimize_dtypes
+from _ts_numba import hour_dow_sums
 
 # Set style
 plt.style.use('ggplot')
 sns.set_palette("husl")
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'STHeiti', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False
+# Simplify and chunk long line paths: the decomposition plots draw every hourly point
+plt.rcParams['path.simplify_threshold'] = 1.0
+plt.rcParams['agg.path.chunksize'] = 10000
+
+Decomposition = namedtuple('Decomposition', ['observed', 'trend', 'seasonal', 'resid'])
+
+def seasonal_decompose_fft(series, period):
+    """
+    Classical additive decomposition, numerically the same as statsmodels'
+    seasonal_decompose(model='additive'), with the centered moving average done
+    by FFT convolution: O(N log N) instead of O(N * period) for long periods.
+    """
+    x = series.to_numpy(dtype=np.float64)
+    n = len(x)
+    if np.isnan(x).any():
+        raise ValueError("This function does not handle missing values")
+    if n < 2 * period:
+        raise ValueError(f"x must have 2 complete cycles requires {2 * period} observations. x only has {n} observation(s)")
+
+    # Centered MA; even periods use the 2xP filter with half weights at both ends
+    if period % 2 == 0:
+        filt = np.r_[0.5, np.ones(period - 1), 0.5] / period
+    else:
+        filt = np.ones(period) / period
+    head = int(np.ceil(len(filt) / 2) - 1)
+    valid = fftconvolve(x, filt, mode='valid')
+    trend = np.full(n, np.nan)
+    trend[head:head + len(valid)] = valid
+
+    # Seasonal component: per-phase mean of the detrended series, centered to zero
+    detrended = x - trend
+    padded = np.full(-(-n // period) * period, np.nan)
+    padded[:n] = detrended
+    period_averages = np.nanmean(padded.reshape(-1, period), axis=0)
+    period_averages -= period_averages.mean()
+    seasonal = np.tile(period_averages, n // period + 1)[:n]
+
+    index = series.index
+    return Decomposition(observed=series,
+                         trend=pd.Series(trend, index=index, name='trend'),
+                         seasonal=pd.Series(seasonal, index=index, name='seasonal'),
+                         resid=pd.Series(detrended - seasonal, index=index, name='resid'))
+
+def _mean_of_runs(df, starts):
+    """
+    Collapse runs of equal index values (beginning at `starts`) to their NaN-skipping
+    column means, like groupby(level=0).mean() on a sorted index, via np.add.reduceat.
+    """
+    values = df.to_numpy(dtype=np.float64, na_value=np.nan)
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(present, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(present, starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return pd.DataFrame(means, index=df.index[starts], columns=df.columns)
 
 def forecast_timeseries_std(file_path, target_col, datetime_col='Datetime', output_dir=None):
     """
-    Perform time series analysis using standard libraries (pandas, statsmodels).
-    Includes hourly trend, holiday analysis, and STL decomposition.
+    Perform time series analysis using standard libraries (pandas, NumPy/SciPy).
+    Includes hourly trend, holiday analysis, and seasonal decomposition.
     """
     try:
-        df = pd.read_csv(file_path)
+        df = optimize_dtypes(load_dataset(file_path, columns=[datetime_col, target_col]))
     except Exception as e:
         print(f"Error reading file: {e}")
         return
@@ -35,18 +96,25 @@ def forecast_timeseries_std(file_path, target_col, datetime_col='Datetime', outp
     df[datetime_col] = pd.to_datetime(df[datetime_col])
     df = df.sort_values(datetime_col).set_index(datetime_col)
 
-    # Handle duplicates if any
-    if df.index.duplicated().any():
+    # Handle duplicates if any (the index is sorted, so equal timestamps are adjacent)
+    idx = df.index.to_numpy()
+    starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+    if len(starts) < len(idx):
         print("Warning: Duplicate timestamps found. Taking mean.")
-        df = df.groupby(level=0).mean()
+        df = _mean_of_runs(df, starts)
 
     # Set frequency (Hourly)
-    df = df.asfreq('H', method='ffill')
+    df = df.asfreq('h', method='ffill')
+
+    # Hour-of-day and weekday profiles in one pass; the weekend split is derived from the weekday sums
+    sums_h, cnts_h, sums_d, cnts_d = hour_dow_sums(df.index.hour, df.index.weekday, df[target_col])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hour_means = sums_h / cnts_h
+        dow_means = sums_d / cnts_d
 
     # 2. Hourly Trend Analysis
     print("Analyzing hourly trends...")
-    df['Hour'] = df.index.hour
-    hourly_avg = df.groupby('Hour')[target_col].mean()
+    hourly_avg = pd.Series(hour_means, index=pd.Index(range(24), name='Hour'), name=target_col)
 
     plt.figure(figsize=(12, 6))
     hourly_avg.plot(kind='line', marker='o', linewidth=2, color='#1f77b4')
@@ -64,14 +132,15 @@ def forecast_timeseries_std(file_path, target_col, datetime_col='Datetime', outp
 
     plt.tight_layout()
     plt.savefig(f'{output_dir}/hourly_trend.png')
+    plt.close()
 
     # 3. Weekend Analysis (Proxy for Holiday)
     print("Analyzing weekend effects...")
     # 0=Monday, 5=Saturday, 6=Sunday
     df['IsWeekend'] = df.index.weekday >= 5
 
-    weekend_mean = df[df['IsWeekend']][target_col].mean()
-    weekday_mean = df[~df['IsWeekend']][target_col].mean()
+    weekend_mean = sums_d[5:].sum() / cnts_d[5:].sum()
+    weekday_mean = sums_d[:5].sum() / cnts_d[:5].sum()
 
     print(f"\nWeekend Avg: {weekend_mean:.2f} MW")
     print(f"Weekday Avg: {weekday_mean:.2f} MW")
@@ -84,11 +153,12 @@ def forecast_timeseries_std(file_path, target_col, datetime_col='Datetime', outp
     plt.ylabel('MW')
     plt.tight_layout()
     plt.savefig(f'{output_dir}/weekend_effect.png')
+    plt.close()
 
     # 4. Decomposition (Trend & Seasonality)
     print("\nDecomposing time series (Trend/Seasonal/Resid)...")
     # Decompose using additive model
-    decomposition = seasonal_decompose(df[target_col], model='additive', period=24*365) # Yearly seasonality
+    decomposition = seasonal_decompose_fft(df[target_col], period=24*365) # Yearly seasonality
 
     fig, axes = plt.subplots(4, 1, figsize=(15, 12), sharex=True)
 
@@ -107,14 +177,12 @@ def forecast_timeseries_std(file_path, target_col, datetime_col='Datetime', outp
 
     plt.tight_layout()
     plt.savefig(f'{output_dir}/decomposition.png')
+    plt.close()
 
     # 5. Weekly Pattern
     print("Analyzing weekly patterns...")
-    df['Weekday'] = df.index.weekday
-    df['DayName'] = df.index.day_name()
-    weekly_avg = df.groupby('DayName')[target_col].mean().reindex(
-        ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    )
+    weekly_avg = pd.Series(dow_means, name=target_col, index=pd.Index(
+        ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], name='DayName'))
 
     plt.figure(figsize=(10, 6))
     weekly_avg.plot(kind='bar', color='#2ca02c', alpha=0.8)
@@ -123,6 +191,7 @@ def forecast_timeseries_std(file_path, target_col, datetime_col='Datetime', outp
     plt.ylim(weekly_avg.min() * 0.9, weekly_avg.max() * 1.05) # Zoom in
     plt.tight_layout()
     plt.savefig(f'{output_dir}/weekly_trend.png')
+    plt.close()
 
     print(f"\nAnalysis complete. Results saved to: {output_dir}")
 
@@ -5,12 +5,14 @@ import numpy as np
 import os
 import sys
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
 from sklearn.metrics import classification_report, r2_score, mean_absolute_error, accuracy_score
 import joblib
+from threadpoolctl import threadpool_limits
+from _dataset_io import load_dataset
+from _dtypes import optimize_dtypes
 
-def predict_target(file_path, target_col, output_dir=None, task_type='auto', save_model=True):
+def predict_target(file_path, target_col, output_dir=None, task_type='auto', save_model=True, n_jobs=1):
     """
     Train a predictive model and generate predictions.
     Outputs:
@@ -19,7 +21,7 @@ def predict_target(file_path, target_col, output_dir=None, task_type='auto', sav
     3. Trained Model (.joblib)
     """
     try:
-        df = pd.read_csv(file_path)
+        df = optimize_dtypes(load_dataset(file_path))
     except Exception as e:
         print(f"Error reading file: {e}")
         return
@@ -41,7 +43,7 @@ def predict_target(file_path, target_col, output_dir=None, task_type='auto', sav
     if 'id' in df.columns.str.lower(): drop_cols.extend(df.columns[df.columns.str.lower() == 'id'].tolist())
 
     # Drop high-cardinality categorical columns (likely IDs or text)
-    for col in df.select_dtypes(include=['object']).columns:
+    for col in df.select_dtypes(include=['object', 'string', 'category']).columns:
         if df[col].nunique() > 100 and col != target_col:
              drop_cols.append(col)
 
@@ -56,8 +58,9 @@ def predict_target(file_path, target_col, output_dir=None, task_type='auto', sav
     X = df_clean.drop(columns=[target_col])
 
     # Detect task type
+    is_label_target = y.dtype == 'object' or isinstance(y.dtype, pd.CategoricalDtype)
     if task_type == 'auto':
-        if y.dtype == 'object' or y.nunique() < 20:
+        if is_label_target or y.nunique() < 20:
             task_type = 'classification'
         else:
             task_type = 'regression'
@@ -66,36 +69,54 @@ def predict_target(file_path, target_col, output_dir=None, task_type='auto', sav
 
     # Feature Encoding
     le_dict = {}
-    for col in X.select_dtypes(include=['object']).columns:
-        le = LabelEncoder()
-        X[col] = le.fit_transform(X[col].astype(str))
-        le_dict[col] = le
+    for col in X.select_dtypes(include=['object', 'string', 'category']).columns:
+        # Reuse the categorical codes from optimize_dtypes; missing values get code -1
+        cat = X[col].astype('category')
+        X[col] = cat.cat.codes.astype(np.int32)
+        le_dict[col] = cat.cat.categories
 
-    # Simple Imputation
-    X = X.fillna(X.median(numeric_only=True)).fillna(0)
+    # No imputation needed: histogram gradient boosting routes NaNs natively
 
     # Target Encoding (for Classification)
-    if task_type == 'classification' and y.dtype == 'object':
-        le_target = LabelEncoder()
-        y = le_target.fit_transform(y)
-        target_classes = le_target.classes_
+    # Categorical codes replace LabelEncoder; the categories Index maps codes back
+    # (and new labels to codes via categories.get_indexer at inference time)
+    if task_type == 'classification' and is_label_target:
+        cat = y.astype('category')
+        y = cat.cat.codes.to_numpy()
+        target_classes = cat.cat.categories
     else:
         target_classes = None
 
     # 2. Train/Test Split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Split row positions (same shuffle as splitting X directly) so the held-out
+    # predictions can be slotted back into the full-dataset output later
+    train_idx, test_idx = train_test_split(np.arange(len(X)), test_size=0.2, random_state=42)
+    y = np.asarray(y)
+    X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
 
     # 3. Modeling
+    # Histogram-based boosting on binned features
     if task_type == 'classification':
-        model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced', n_jobs=1)
+        model = HistGradientBoostingClassifier(max_iter=200, early_stopping=True, random_state=42, class_weight='balanced')
     else:
-        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=1)
+        model = HistGradientBoostingRegressor(max_iter=200, early_stopping=True, random_state=42)
 
     print("Training model...")
-    model.fit(X_train, y_train)
+    # Its OpenMP split finding would use every core; stay at n_jobs threads (1 by default)
+    with threadpool_limits(limits=n_jobs if n_jobs > 0 else None, user_api='openmp'):
+        model.fit(X_train, y_train)
 
-    # 4. Evaluation
-    y_pred = model.predict(X_test)
+        # 4. Evaluation
+        # For classifiers predict() is argmax(predict_proba()), so traverse the trees once
+        if task_type == 'classification':
+            proba_test = model.predict_proba(X_test)
+            y_pred = model.classes_[np.argmax(proba_test, axis=1)]
+            # Reuse the test-set predictions for the full output; only the training rows still need a pass
+            proba_train = model.predict_proba(X_train)
+        else:
+            y_pred = model.predict(X_test)
+            pred_train = model.predict(X_train)
 
     with open(report_file, 'w') as f:
         f.write(f"# Prediction Report: {target_col}\n\n")
@@ -105,7 +126,12 @@ def predict_target(file_path, target_col, output_dir=None, task_type='auto', sav
         if task_type == 'classification':
             acc = accuracy_score(y_test, y_pred)
             f.write(f"- **Accuracy**: {acc:.4f}\n\n")
-            f.write("```\n" + classification_report(y_test, y_pred) + "\n```\n")
+            if target_classes is not None:
+                report = classification_report(y_test, y_pred, labels=np.arange(len(target_classes)),
+                                               target_names=target_classes.astype(str), zero_division=0)
+            else:
+                report = classification_report(y_test, y_pred)
+            f.write("```\n" + report + "\n```\n")
         else:
             r2 = r2_score(y_test, y_pred)
             mae = mean_absolute_error(y_test, y_pred)
@@ -114,18 +140,28 @@ def predict_target(file_path, target_col, output_dir=None, task_type='auto', sav
 
     # 5. Output Predictions (Full Dataset)
     print("Generating predictions for full dataset...")
-    full_pred = model.predict(X)
-
-    # Create result dataframe
-    result_df = df.copy() # Use original df to keep IDs
+    if task_type == 'classification':
+        probs = np.empty((len(X), proba_test.shape[1]))
+        probs[test_idx] = proba_test
+        probs[train_idx] = proba_train
+        full_pred = model.classes_[np.argmax(probs, axis=1)]
+    else:
+        full_pred = np.empty(len(X), dtype=y_pred.dtype)
+        full_pred[test_idx] = y_pred
+        full_pred[train_idx] = pred_train
 
+    # Create result dataframe: the original columns (to keep IDs) plus the prediction
+    # columns, concatenated side by side rather than copying df to insert into it.
+    # Predictions align on the index, so rows dropped for a missing target stay empty
     if task_type == 'classification' and target_classes is not None:
-        result_df['Predicted_Value'] = [target_classes[i] for i in full_pred]
-        # Add probabilities if classification
-        probs = model.predict_proba(X)
-        result_df['Prediction_Confidence'] = np.max(probs, axis=1)
+        predictions = pd.DataFrame({
+            'Predicted_Value': target_classes.take(full_pred),
+            # Add probabilities if classification
+            'Prediction_Confidence': np.max(probs, axis=1),
+        }, index=df_clean.index)
     else:
-        result_df['Predicted_Value'] = full_pred
+        predictions = pd.DataFrame({'Predicted_Value': full_pred}, index=df_clean.index)
+    result_df = pd.concat([df, predictions], axis=1)
 
     csv_path = os.path.join(output_dir, "predictions.csv")
     result_df.to_csv(csv_path, index=False)
@@ -145,7 +181,8 @@ if __name__ == "__main__":
     parser.add_argument("target_col", help="Target column to predict")
     parser.add_argument("--output", "-o", help="Output directory")
     parser.add_argument("--type", choices=['auto', 'classification', 'regression'], default='auto')
+    parser.add_argument("--n-jobs", type=int, default=1, help="Threads for model fit and prediction (-1 = all cores)")
 
     args = parser.parse_args()
 
-    predict_target(args.file_path, args.target_col, args.output, args.type)
+    predict_target(args.file_path, args.target_col, args.output, args.type, n_jobs=args.n_jobs)